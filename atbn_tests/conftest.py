@@ -5,6 +5,10 @@ Pytest configuration and shared fixtures for ESP32C6 AT command tests.
 import pytest
 import os
 
+def _wifi_configured():
+    """Return True if WIFI_SSID is set, the only source the tester joins with."""
+    return bool(os.getenv('WIFI_SSID'))
+
 def pytest_configure(config):
     """Configure pytest with custom settings."""
     # Add custom markers
@@ -18,6 +22,12 @@ def pytest_collection_modifyitems(config, items):
     """Modify collected test items."""
     # Add hardware marker to all tests since they require ESP32C6 connection
     hardware_marker = pytest.mark.hardware
+    
+    # Decide the WiFi skip once here rather than in every test's setup
+    skip_wifi = None
+    if not _wifi_configured():
+        skip_wifi = pytest.mark.skip(reason="WiFi credentials not configured")
+    
     for item in items:
         item.add_marker(hardware_marker)
         
@@ -29,44 +39,34 @@ def pytest_collection_modifyitems(config, items):
         if "performance" in item.name.lower():
             item.add_marker(pytest.mark.performance)
             item.add_marker(pytest.mark.slow)
+        if skip_wifi and ("wifi" in item.keywords or "requires_wifi" in item.keywords):
+            item.add_marker(skip_wifi)
 
 def pytest_sessionstart(session):
     """Called after the Session object has been created."""
-    print("\n" + "="*60)
-    print("ESP32C6 AT Commands Test Session Starting")
-    print("="*60)
-    print("Make sure:")
-    print("1. ESP32C6 is connected via UART1 (GPIO 6/7)")
-    print("2. Custom AT firmware is flashed")
-    print("3. Configuration is set in config.ini")
-    print("4. Hardware is powered on and ready")
-    print("="*60)
+    print("\n".join([
+        "",
+        "="*60,
+        "ESP32C6 AT Commands Test Session Starting",
+        "="*60,
+        "Make sure:",
+        "1. ESP32C6 is connected via UART1 (GPIO 6/7)",
+        "2. Custom AT firmware is flashed",
+        "3. Configuration is set in config.ini",
+        "4. Hardware is powered on and ready",
+        "="*60,
+    ]))
 
 def pytest_sessionfinish(session, exitstatus):
     """Called after whole test run finished."""
-    print("\n" + "="*60)
-    print("ESP32C6 AT Commands Test Session Finished")
-    if exitstatus == 0:
-        print("Status: ALL TESTS PASSED ✓")
-    else:
-        print("Status: SOME TESTS FAILED ✗")
-    print("="*60)
-
-def pytest_runtest_setup(item):
-    """Called before each test function execution."""
-    # Skip WiFi tests if no credentials provided
-    if "wifi" in item.keywords:
-        try:
-            from simple_test import load_config
-            config = load_config()
-            if config:
-                ssid = config.get('wifi', 'ssid', fallback='')
-                if not ssid:
-                    pytest.skip("WiFi credentials not configured in config.ini")
-            else:
-                pytest.skip("Configuration file not available")
-        except Exception:
-            pytest.skip("Could not check WiFi configuration")
+    status = "ALL TESTS PASSED ✓" if exitstatus == 0 else "SOME TESTS FAILED ✗"
+    print("\n".join([
+        "",
+        "="*60,
+        "ESP32C6 AT Commands Test Session Finished",
+        f"Status: {status}",
+        "="*60,
+    ]))
 
 @pytest.fixture(scope="session", autouse=True)
 def check_dependencies():
@@ -92,5 +92,5 @@ def pytest_terminal_summary(terminalreporter, exitstatus, config):
         terminalreporter.write_line("3. Custom AT firmware is properly flashed")
         terminalreporter.write_line("4. UART1 connections (GPIO 6/7)")
         terminalreporter.write_line("5. SD card is inserted and properly wired")
-        terminalreporter.write_line("6. WiFi credentials in config.ini (for WiFi tests)")
+        terminalreporter.write_line("6. WIFI_SSID/WIFI_PASSWORD in .env (for WiFi tests)")
         terminalreporter.write_line("")